@@ -1,25 +1,211 @@
-import csv
 import os
 from abc import ABC, abstractmethod
-from typing import Dict, List, Iterator, Any
+from bisect import insort
+from functools import partial
+from typing import BinaryIO, Callable, Dict, List, Iterator, Tuple, Optional, Any
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+from pyarrow import csv as arrow_csv
+
+try:
+    from numba import njit, prange, types
+except ImportError:
+    # Numba is optional, process_batch falls back to plain NumPy without it
+    njit = None
+
+
+# Column types for the input CSVs so Arrow parses numbers once, up front
+SALES_COLUMN_TYPES = {'sku': pa.string(), 'quantity_sold': pa.int32()}
+PRODUCT_COLUMN_TYPES = {
+    'sku': pa.string(),
+    'stock': pa.int32(),
+    'current_price': pa.float64(),
+    'cost_price': pa.float64()
+}
+OUTPUT_COLUMNS = ['sku', 'old_price', 'new_price']
+# Output lines end in \r\n, as csv.writer's default dialect did
+OUTPUT_HEADER = (','.join(OUTPUT_COLUMNS) + '\r\n').encode()
+
+# Products are parsed and priced in blocks of this many bytes at a time
+PRODUCTS_BLOCK_SIZE = 1 << 22
+# Large file buffers amortize read and write syscalls over many rows
+IO_BUFFER_SIZE = 1 << 22
+
+
+def round_cents(prices: np.ndarray) -> np.ndarray:
+    """
+    Round prices to whole cents, matching the built-in round(price, 2) exactly
+    np.round scales by 100 first, which can turn a value just below a half cent
+    (e.g. 197.25 * 0.9 == 177.52499999999998) into an exact tie and round it up
+    """
+    scaled = prices * 100
+    cents = np.rint(scaled)
+    
+    # Only products that landed exactly on a half cent can be on the wrong side
+    with np.errstate(invalid='ignore'):
+        # inf - inf is nan, which is never a tie, so infinite prices pass through
+        ties = np.flatnonzero(scaled - np.floor(scaled) == 0.5)
+    tie_prices = prices[ties]
+    tie_scaled = scaled[ties]
+    
+    # Exact rounding error of prices * 100 (Dekker's product) decides the tie
+    split = tie_prices * 134217729.0
+    high = split - (split - tie_prices)
+    error = (high * 100 - tie_scaled) + (tie_prices - high) * 100
+    cents[ties] = np.where(error > 0, np.ceil(tie_scaled),
+                           np.where(error < 0, np.floor(tie_scaled), cents[ties]))
+    
+    return cents
+
+
+def exact_cents(cents: np.ndarray) -> np.ndarray:
+    """
+    Return a mask of the amounts in cents that are held exactly, and so are safe
+    to do integer arithmetic on. inf, nan and anything from 2**53 cents up are not
+    """
+    return np.abs(cents) < 2 ** 53
+
+
+def round_prices(prices: np.ndarray) -> np.ndarray:
+    """Round prices to 2 decimal places, matching the built-in round() exactly"""
+    cents = round_cents(prices)
+    rounded = cents / 100
+    
+    # Beyond 2**53 the cents themselves are inexact, so leave those to round()
+    inexact = ~exact_cents(cents)
+    if inexact.any():
+        rounded[inexact] = [round(price, 2) for price in prices[inexact].tolist()]
+    
+    return rounded
+
+
+def format_prices(prices: np.ndarray) -> pa.Array:
+    """Format prices like f"${price:.2f}" with Arrow compute instead of per-row string formatting"""
+    cents = round_cents(prices)
+    exact = exact_cents(cents)
+    whole_cents = np.abs(np.where(exact, cents, 0)).astype(np.int64)
+    
+    dollars = pa.array(whole_cents // 100).cast(pa.string())
+    fraction = pc.utf8_lpad(pa.array(whole_cents % 100).cast(pa.string()), width=2, padding='0')
+    # signbit rather than < 0 so that -0.001 still comes out as "$-0.00"
+    negative = np.signbit(cents)
+    prefix = pc.if_else(pa.array(negative), '$-', '$') if negative.any() else '$'
+    formatted = pc.binary_join_element_wise(prefix, dollars, '.', fraction, '')
+    
+    # Huge and non-finite prices don't fit in int64 cents, so format them one by one
+    if not exact.all():
+        formatted = pc.replace_with_mask(formatted, pa.array(~exact),
+                                         pa.array([f"${price:.2f}" for price in prices[~exact].tolist()]))
+    
+    return formatted
+
+
+if njit is not None:
+    # Compiled eagerly for the Arrow column types so the JIT cost is paid at import,
+    # inputs are read-only since Arrow hands out zero-copy views of its buffers
+    _int_column = types.Array(types.int32, 1, 'A', readonly=True)
+    _float_column = types.Array(types.float64, 1, 'A', readonly=True)
+    
+    @njit(types.void(_int_column, _int_column, _float_column, _float_column, types.float64[:]),
+          parallel=True, cache=True)
+    def _price_kernel(stock, qty_sold, current_price, cost_price, out):
+        """Apply the four standard rules to every product in parallel, unrounded"""
+        for i in prange(stock.shape[0]):
+            s = stock[i]
+            q = qty_sold[i]
+            price = current_price[i]
+            
+            if s < 20 and q > 30:
+                price *= 1.15
+            elif s > 200 and q == 0:
+                price *= 0.7
+            elif s > 100 and q < 20:
+                price *= 0.9
+            
+            minimum_price = cost_price[i] * 1.2
+            if price < minimum_price:
+                price = minimum_price
+            
+            out[i] = price
+else:
+    _price_kernel = None
+
+# The (condition, factor) branches and minimum profit markup _price_kernel hard-codes
+_KERNEL_BRANCHES = [('(stock < 20) & (qty_sold > 30)', 1.15),
+                    ('(stock > 200) & (qty_sold == 0)', 0.7),
+                    ('(stock > 100) & (qty_sold < 20)', 0.9)]
+_KERNEL_MARKUP = 1.2
+
+
+def _check_not_defined(cls: type, attribute: str, methods: Tuple[str, ...]) -> None:
+    """Refuse a rule class that defines methods which would be generated from attribute"""
+    defined = [name for name in methods if name in vars(cls)]
+    if defined:
+        raise TypeError(f"{cls.__name__} declares {attribute}, so it can't also define {', '.join(defined)}")
+
+
+def _scale_by_factor(self, current_price, cost_price, new_price):
+    """apply() and apply_batch() for rules that declare a factor"""
+    return current_price * self.factor
 
 
 class PricingRule(ABC):
     """Abstract base class for all pricing , this will help to define the new rule,"""
     
+    # Multiplier for rules that just scale the current price. A rule declaring it
+    # gets apply() and apply_batch() generated from it, and the engine can
+    # multiply by it directly instead of calling apply()
+    factor: Optional[float] = None
+    # Expression over stock and qty_sold, combining comparisons with & and | so it
+    # works on single numbers and on NumPy arrays alike. A rule declaring it gets
+    # should_apply() and should_apply_batch() generated from it, and the engine
+    # can inline it. A subclass overriding the generated methods without
+    # redeclaring these has its own methods called as usual
+    condition: Optional[str] = None
+    
     def __init__(self, priority: int):
         self.priority = priority  # Lower number means higher priority
     
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Generate the methods from the declared condition and factor, so there is
+        # only one copy of each for the methods and the engine to disagree over
+        if vars(cls).get('condition') is not None:
+            _check_not_defined(cls, 'condition', ('should_apply', 'should_apply_batch'))
+            predicate = eval(f'lambda stock, qty_sold: {cls.condition}', {})
+            cls.should_apply = cls.should_apply_batch = staticmethod(predicate)
+        if vars(cls).get('factor') is not None:
+            _check_not_defined(cls, 'factor', ('apply', 'apply_batch'))
+            cls.apply = cls.apply_batch = _scale_by_factor
+    
     @abstractmethod
-    def should_apply(self, product: Dict[str, Any], sales_data: Dict[str, Any]) -> bool:
+    def should_apply(self, stock: int, qty_sold: int) -> bool:
         """Determine if this rule should be applied to the product"""
         pass
     
     @abstractmethod
-    def apply(self, product: Dict[str, Any], sales_data: Dict[str, Any]) -> float:
+    def apply(self, current_price: float, cost_price: float, new_price: float) -> float:
         """Apply the rule and return the new price"""
         pass
     
+    def should_apply_batch(self, stock: np.ndarray, qty_sold: np.ndarray) -> np.ndarray:
+        """
+        Return a boolean mask of the products this rule should be applied to
+        Calls should_apply() for each product, override it with a vectorized version
+        """
+        return np.fromiter(map(self.should_apply, stock.tolist(), qty_sold.tolist()),
+                           dtype=bool, count=len(stock))
+    
+    def apply_batch(self, current_price: np.ndarray, cost_price: np.ndarray,
+                    new_price: np.ndarray) -> np.ndarray:
+        """
+        Apply the rule to a batch of products and return their new prices
+        Calls apply() for each product, override it with a vectorized version
+        """
+        return np.fromiter(map(self.apply, current_price.tolist(), cost_price.tolist(), new_price.tolist()),
+                           dtype=np.float64, count=len(current_price))
+    
     def __lt__(self, other):
         """Allow rules to be sorted by priority"""
         return self.priority < other.priority
@@ -28,63 +214,127 @@ class PricingRule(ABC):
 class LowStockHighDemandRule(PricingRule):
     """Rule 1: Increase price by 15% if stock < 20 and quantity_sold > 30"""
     
+    factor = 1.15
+    condition = '(stock < 20) & (qty_sold > 30)'
+    
     def __init__(self, priority: int = 1):
         super().__init__(priority)
-    
-    def should_apply(self, product: Dict[str, Any], sales_data: Dict[str, Any]) -> bool:
-        return (int(product['stock']) < 20 and 
-                int(sales_data.get('quantity_sold', 0)) > 30)
-    
-    def apply(self, product: Dict[str, Any], sales_data: Dict[str, Any]) -> float:
-        current_price = float(product['current_price'])
-        return current_price * 1.15
 
 
 class DeadStockRule(PricingRule):
     """Rule 2: Decrease price by 30% if stock > 200 and quantity_sold == 0"""
     
+    factor = 0.7
+    condition = '(stock > 200) & (qty_sold == 0)'
+    
     def __init__(self, priority: int = 2):
         super().__init__(priority)
-    
-    def should_apply(self, product: Dict[str, Any], sales_data: Dict[str, Any]) -> bool:
-        return (int(product['stock']) > 200 and 
-                int(sales_data.get('quantity_sold', 0)) == 0)
-    
-    def apply(self, product: Dict[str, Any], sales_data: Dict[str, Any]) -> float:
-        current_price = float(product['current_price'])
-        return current_price * 0.7
 
 
 class OverstockedInventoryRule(PricingRule):
     """Rule 3: Decrease price by 10% if stock > 100 and quantity_sold < 20"""
     
+    factor = 0.9
+    condition = '(stock > 100) & (qty_sold < 20)'
+    
     def __init__(self, priority: int = 3):
         super().__init__(priority)
-    
-    def should_apply(self, product: Dict[str, Any], sales_data: Dict[str, Any]) -> bool:
-        return (int(product['stock']) > 100 and 
-                int(sales_data.get('quantity_sold', 0)) < 20)
-    
-    def apply(self, product: Dict[str, Any], sales_data: Dict[str, Any]) -> float:
-        current_price = float(product['current_price'])
-        return current_price * 0.9
 
 
 class MinimumProfitRule(PricingRule):
     """Rule 4: Ensure price is at least 20% above cost_price"""
+    
+    markup = 1.2
+    
     #set priority to 99 to always come at last
     def __init__(self, priority: int = 99):
         super().__init__(priority)
     
-    def should_apply(self, product: Dict[str, Any], sales_data: Dict[str, Any]) -> bool:
+    def should_apply(self, stock: int, qty_sold: int) -> bool:
         # This rule is always checked
         return True
     
-    def apply(self, product: Dict[str, Any], sales_data: Dict[str, Any]) -> float:
-        cost_price = float(product['cost_price'])
-        minimum_price = cost_price * 1.2
-        current_new_price = float(product.get('new_price', product['current_price']))
-        return max(current_new_price, minimum_price)
+    def apply(self, current_price: float, cost_price: float, new_price: float) -> float:
+        minimum_price = cost_price * self.markup
+        return max(new_price, minimum_price)
+    
+    def should_apply_batch(self, stock: np.ndarray, qty_sold: np.ndarray) -> np.ndarray:
+        return np.ones(stock.shape, dtype=bool)
+    
+    def apply_batch(self, current_price: np.ndarray, cost_price: np.ndarray,
+                    new_price: np.ndarray) -> np.ndarray:
+        return np.maximum(new_price, cost_price * self.markup)
+
+
+def _defining_class(rule: PricingRule, name: str) -> type:
+    """Return the class in the rule's hierarchy that defines the named attribute"""
+    return next(cls for cls in type(rule).__mro__ if name in vars(cls))
+
+
+def _declared_with(rule: PricingRule, name: str, method: str) -> bool:
+    """
+    Check that the named attribute was defined alongside or below the method it
+    stands in for, so a subclass that only overrides the method isn't described
+    by an attribute it inherited
+    """
+    return issubclass(_defining_class(rule, name), _defining_class(rule, method))
+
+
+def _batch_methods(rule: PricingRule) -> Tuple[Callable[..., np.ndarray], Callable[..., np.ndarray]]:
+    """Return the rule's should_apply_batch and apply_batch, or the per-product defaults if they're stale"""
+    should_apply_batch = rule.should_apply_batch
+    if not _declared_with(rule, 'should_apply_batch', 'should_apply'):
+        should_apply_batch = partial(PricingRule.should_apply_batch, rule)
+    apply_batch = rule.apply_batch
+    if not _declared_with(rule, 'apply_batch', 'apply'):
+        apply_batch = partial(PricingRule.apply_batch, rule)
+    return should_apply_batch, apply_batch
+
+
+def _rule_condition(rule: PricingRule) -> Optional[str]:
+    """Return the rule's condition, or None if it doesn't describe should_apply()"""
+    # should_apply() was generated from the class's condition, not the instance's
+    condition = type(rule).condition
+    if condition is not None and _declared_with(rule, 'condition', 'should_apply'):
+        return condition
+    return None
+
+
+def _rule_factor(rule: PricingRule) -> Optional[float]:
+    """Return the rule's factor, or None if it doesn't describe apply()"""
+    if rule.factor is not None and _declared_with(rule, 'factor', 'apply'):
+        return rule.factor
+    return None
+
+
+def _rule_entry(rule: PricingRule) -> Tuple[Callable[[int, int], bool], Optional[float],
+                                            Callable[[float, float, float], float]]:
+    """Return the (predicate, factor, apply) entry for a rule in PricingEngine's rule table"""
+    # For rules declaring a condition, should_apply is already the plain function
+    # generated from it, so the table and the rule can't disagree
+    return (rule.should_apply, _rule_factor(rule), rule.apply)
+
+
+def _priced_source(branches: List[Tuple[str, float]], markup: Optional[float]) -> str:
+    """
+    Return the source of a _priced function that applies the factor of the first
+    matching (condition, factor) branch, then raises the price to cost * markup
+    """
+    lines = ['def _priced(stock, qty_sold, current_price, cost_price):',
+             '    new_price = current_price']
+    keyword = 'if'
+    for condition, factor in branches:
+        lines.append(f'    {keyword} {condition}:')
+        lines.append(f'        new_price = current_price * {factor!r}')
+        keyword = 'elif'
+    if markup is not None:
+        lines.append(f'    new_price = max(new_price, cost_price * {markup!r})')
+    lines.append('    return new_price')
+    return '\n'.join(lines)
+
+
+# compile() only hands out _price_kernel for rules that generate exactly this source
+_KERNEL_SOURCE = _priced_source(_KERNEL_BRANCHES, _KERNEL_MARKUP)
 
 
 class PricingEngine:
@@ -94,96 +344,261 @@ class PricingEngine:
     
     def __init__(self):
         self.rules: List[PricingRule] = []
+        # Rules 1-3 in priority order, and the minimum profit rule applied after them,
+        # split out of self.rules by compile()
+        self.exclusive_rules: List[PricingRule] = []
+        self.floor_rule: Optional[MinimumProfitRule] = None
+        # (predicate, factor, apply) for each exclusive rule, scanned per product. The
+        # factor is None unless the rule's apply() just multiplies by it
+        self._rule_table: Tuple[Tuple[Callable[[int, int], bool], Optional[float],
+                                      Callable[[float, float, float], float]], ...] = ()
+        # (should_apply_batch, apply_batch) for each exclusive rule, then the floor rule's apply_batch
+        self._batch_table: Tuple[Tuple[Callable[..., np.ndarray], Callable[..., np.ndarray]], ...] = ()
+        self._floor_batch: Optional[Callable[..., np.ndarray]] = None
+        # Price functions specialized to the current rules by compile()
+        self._compiled = False
+        self._priced: Optional[Callable[[int, int, float, float], float]] = None
+        self._priced_batch: Optional[Callable[..., None]] = None
     
     def add_rule(self, rule: PricingRule) -> None:
         """Add a rule to the engine"""
-        self.rules.append(rule)
-        # Sort rules by priority, with highest priority (lowest number) first
-        self.rules.sort()
-    
-    def process_product(self, product: Dict[str, Any], sales_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Process a single product through all applicable rules"""
-        result = product.copy()
-        result['old_price'] = float(product['current_price'])
+        # Keep rules sorted by priority, with highest priority (lowest number) first,
+        # inserting after any rules of equal priority just as a stable sort would
+        insort(self.rules, rule)
+        # The tables are rebuilt by compile() before the next product is priced
+        self._compiled = False
+    
+    def _split_rules(self) -> None:
+        """Separate the mutually exclusive rules from the minimum profit rule and build their tables"""
+        self.exclusive_rules = [rule for rule in self.rules if not isinstance(rule, MinimumProfitRule)]
+        floor_rules = [rule for rule in self.rules if isinstance(rule, MinimumProfitRule)]
+        self.floor_rule = floor_rules[0] if floor_rules else None
+        self._rule_table = tuple(_rule_entry(rule) for rule in self.exclusive_rules)
+        self._batch_table = tuple(_batch_methods(rule) for rule in self.exclusive_rules)
+        self._floor_batch = _batch_methods(self.floor_rule)[1] if self.floor_rule is not None else None
+    
+    def compile(self) -> None:
+        """
+        Build the rule tables and generate a price function specialized to the
+        current rules, with their conditions and factors inlined, so pricing skips
+        the generic rule loop. Called automatically before the first product is
+        priced after the rules change
+        """
+        self._compiled = True
+        self._split_rules()
+        self._priced = None
+        self._priced_batch = None
+        
+        # Only rules whose condition and factor describe their methods can be inlined
+        branches = [(_rule_condition(rule), _rule_factor(rule)) for rule in self.exclusive_rules]
+        if any(condition is None or factor is None for condition, factor in branches):
+            return
+        markup = None
+        if self.floor_rule is not None:
+            if not _declared_with(self.floor_rule, 'markup', 'apply'):
+                return
+            markup = self.floor_rule.markup
         
-        # First, apply the first applicable rule from rules 1-3 (if any)
-        # These rules are mutually exclusive - only apply the highest priority rule
-        applied_exclusive_rule = False
+        source = _priced_source(branches, markup)
+        namespace: Dict[str, Any] = {}
+        exec(source, namespace)
+        self._priced = namespace['_priced']
         
-        # Find and apply highest priority rule that should be applied
-        for rule in self.rules:
-            # Skip the minimum profit rule which is always applied at the end
-            if isinstance(rule, MinimumProfitRule):
-                continue
-                
-            if rule.should_apply(product, sales_data):
-                result['new_price'] = rule.apply(product, sales_data)
-                applied_exclusive_rule = True
-                break
+        if njit is None:
+            return
+        if source == _KERNEL_SOURCE:
+            # Already compiled at import and cached on disk
+            self._priced_batch = _price_kernel
+        else:
+            namespace = {'prange': prange, '_priced': njit(self._priced)}
+            exec('def _priced_batch(stock, qty_sold, current_price, cost_price, out):\n'
+                 '    for i in prange(stock.shape[0]):\n'
+                 '        out[i] = _priced(stock[i], qty_sold[i], current_price[i], cost_price[i])\n',
+                 namespace)
+            self._priced_batch = njit(parallel=True)(namespace['_priced_batch'])
+    
+    def process_product(self, product: Dict[str, Any], sales_data: Dict[str, Any]) -> Tuple[str, float, float]:
+        """Process a single product through all applicable rules, returning (sku, old_price, new_price)"""
+        # Convert the fields once up front rather than inside every rule
+        stock = int(product['stock'])
+        qty_sold = int(sales_data.get('quantity_sold', 0) or 0)
+        current_price = float(product['current_price'])
+        cost_price = float(product['cost_price'])
         
-        # If no exclusive rule was applied, use the current price
-        if not applied_exclusive_rule:
-            result['new_price'] = float(product['current_price'])
+        if not self._compiled:
+            self.compile()
         
-        # Always apply the minimum profit rule at the end if it exists
-        min_profit_rules = [r for r in self.rules if isinstance(r, MinimumProfitRule)]
-        if min_profit_rules:
-            min_profit_rule = min_profit_rules[0]
-            result['new_price'] = min_profit_rule.apply(result, sales_data)
+        if self._priced is not None:
+            new_price = self._priced(stock, qty_sold, current_price, cost_price)
+        else:
+            # If no exclusive rule is applied, the current price is kept
+            new_price = current_price
+            
+            # Apply the first applicable rule from rules 1-3 (if any)
+            # These rules are mutually exclusive - only apply the highest priority rule
+            for predicate, factor, apply in self._rule_table:
+                if predicate(stock, qty_sold):
+                    if factor is not None:
+                        new_price = current_price * factor
+                    else:
+                        new_price = apply(current_price, cost_price, new_price)
+                    break
+            
+            # Always apply the minimum profit rule at the end if it exists
+            if self.floor_rule is not None:
+                new_price = self.floor_rule.apply(current_price, cost_price, new_price)
         
         # Round to 2 decimal places
-        result['new_price'] = round(result['new_price'], 2)
+        return (product['sku'], current_price, round(new_price, 2))
+    
+    def process_batch(self, stock: np.ndarray, qty_sold: np.ndarray,
+                      current_price: np.ndarray, cost_price: np.ndarray) -> np.ndarray:
+        """Process a batch of products held as NumPy arrays and return their new prices"""
+        if not self._compiled:
+            self.compile()
         
-        return result
+        # Use the Numba kernel compiled for the current rules if there is one
+        if self._priced_batch is not None:
+            new_price = np.empty(current_price.shape, dtype=np.float64)
+            self._priced_batch(np.asarray(stock, dtype=np.int32),
+                               np.asarray(qty_sold, dtype=np.int32),
+                               np.asarray(current_price, dtype=np.float64),
+                               np.asarray(cost_price, dtype=np.float64),
+                               new_price)
+            return round_prices(new_price)
+        
+        new_price = current_price.copy()
+        
+        # Products not yet claimed by one of the mutually exclusive rules 1-3
+        unmatched = np.ones(stock.shape, dtype=bool)
+        
+        for should_apply_batch, apply_batch in self._batch_table:
+            mask = should_apply_batch(stock, qty_sold) & unmatched
+            # Like apply(), apply_batch() only sees the products the rule applies to
+            if mask.any():
+                new_price[mask] = apply_batch(current_price[mask], cost_price[mask], new_price[mask])
+            unmatched &= ~mask
+        
+        # Always apply the minimum profit rule at the end if it exists
+        if self._floor_batch is not None:
+            new_price = self._floor_batch(current_price, cost_price, new_price)
+        
+        # Round to 2 decimal places
+        return round_prices(new_price)
+
+
+def load_sales_data(file_path: str) -> pa.Table:
+    """Load sales data from CSV file as an Arrow table sorted by SKU for lookup_quantities"""
+    with pa.input_stream(file_path, buffer_size=IO_BUFFER_SIZE) as source:
+        table = arrow_csv.read_csv(
+            source,
+            convert_options=arrow_csv.ConvertOptions(column_types=SALES_COLUMN_TYPES,
+                                                     include_columns=list(SALES_COLUMN_TYPES))
+        )
+    
+    # The sort is stable, so a SKU listed twice keeps its rows in file order
+    return table.sort_by([('sku', 'ascending')]).combine_chunks()
+
+
+def lookup_quantities(skus: pa.Array, sales_data: pa.Table) -> np.ndarray:
+    """Look up the quantity sold for each SKU, defaulting to 0 if not found"""
+    if sales_data.num_rows == 0:
+        return np.zeros(len(skus), dtype=np.int32)
+    sales_skus = sales_data.column('sku')
+    
+    # Binary search the sorted SKUs, taking the last row for a SKU listed twice.
+    # Unlike index_in, this doesn't rebuild a hash table of all sales per batch
+    positions = pc.search_sorted(sales_skus, skus, side='right')
+    positions = pc.fill_null(positions, 0).to_numpy().astype(np.int64) - 1
+    positions = np.maximum(positions, 0)
+    
+    found = pc.equal(sales_skus.take(positions), skus)
+    qty_sold = pc.if_else(pc.fill_null(found, False),
+                          sales_data.column('quantity_sold').take(positions), 0)
+    return pc.fill_null(qty_sold, 0).to_numpy().astype(np.int32)
 
 
-def load_sales_data(file_path: str) -> Dict[str, Dict[str, Any]]:
-    """Load sales data from CSV file, indexed by SKU"""
-    sales_data = {}
+def price_batch(batch: pa.RecordBatch, sales_data: pa.Table,
+                pricing_engine: PricingEngine) -> pa.RecordBatch:
+    """Price a batch of products as vectorized arrays, returning SKUs with old and new prices"""
+    skus = batch.column('sku')
     
-    with open(file_path, 'r', newline='') as file:
-        reader = csv.DictReader(file)
-        for row in reader:
-            sales_data[row['sku']] = row
+    # Arrow reads a blank number as null, which would turn into NaN or garbage below
+    for name in ('stock', 'current_price', 'cost_price'):
+        column = batch.column(name)
+        if column.null_count:
+            row = pc.index(pc.is_null(column), True).as_py()
+            raise ValueError(f"Missing {name} for product {skus[row].as_py()}")
     
-    return sales_data
+    # Get sales data for each product (default to 0 sold if not found)
+    qty_sold = lookup_quantities(skus, sales_data)
+    
+    current_price = batch.column('current_price').to_numpy(zero_copy_only=False)
+    new_price = pricing_engine.process_batch(
+        batch.column('stock').to_numpy(zero_copy_only=False),
+        qty_sold,
+        current_price,
+        batch.column('cost_price').to_numpy(zero_copy_only=False)
+    )
+    
+    return pa.RecordBatch.from_arrays([skus, pa.array(current_price), pa.array(new_price)],
+                                      names=OUTPUT_COLUMNS)
 
 
-def process_products(products_file: str, sales_file: str, 
-                     pricing_engine: PricingEngine) -> Iterator[Dict[str, Any]]:
+def process_products(products_file: str, sales_data: pa.Table,
+                     pricing_engine: PricingEngine) -> Iterator[pa.RecordBatch]:
     """
-    Process products one by one to minimize memory usage
-    Yields processed products with updated prices
+    Stream products from the file in blocks to keep memory usage flat
+    Yields batches of processed products with updated prices
     """
-    # Load sales data into memory (it's typically smaller than product data)
-    sales_data = load_sales_data(sales_file)
+    with pa.input_stream(products_file, buffer_size=IO_BUFFER_SIZE) as source:
+        reader = arrow_csv.open_csv(
+            source,
+            read_options=arrow_csv.ReadOptions(block_size=PRODUCTS_BLOCK_SIZE),
+            convert_options=arrow_csv.ConvertOptions(column_types=PRODUCT_COLUMN_TYPES,
+                                                     include_columns=list(PRODUCT_COLUMN_TYPES))
+        )
+        
+        for batch in reader:
+            yield price_batch(batch, sales_data, pricing_engine)
+
+
+def format_csv_lines(batch: pa.RecordBatch) -> pa.Array:
+    """Format a batch of processed products as complete output CSV lines"""
+    # Quote SKUs only when they need it, the same way csv.writer does, and skip
+    # building the quoted copies when no SKU in the batch needs it
+    skus = pc.fill_null(batch.column('sku'), '')
+    needs_quotes = pc.match_substring_regex(skus, '[,"\r\n]')
+    if pc.any(needs_quotes).as_py():
+        quoted_skus = pc.binary_join_element_wise('"', pc.replace_substring(skus, '"', '""'), '"', '')
+        skus = pc.if_else(needs_quotes, quoted_skus, skus)
     
-    with open(products_file, 'r', newline='') as file:
-        reader = csv.DictReader(file)
-        for product in reader:
-            # Get sales data for this product (default to 0 sold if not found)
-            product_sales = sales_data.get(product['sku'], {'quantity_sold': '0'})
-            
-            # Process the product and yield the result
-            yield pricing_engine.process_product(product, product_sales)
+    # Format prices with $ sign for output
+    old_prices = format_prices(batch.column('old_price').to_numpy(zero_copy_only=False))
+    new_prices = format_prices(batch.column('new_price').to_numpy(zero_copy_only=False))
+    
+    return pc.binary_join_element_wise(skus, ',', old_prices, ',', new_prices, '\r\n', '')
 
 
-def write_output(products: Iterator[Dict[str, Any]], output_file: str) -> None:
-    """Write processed products to output CSV file"""
-    fieldnames = ['sku', 'old_price', 'new_price']
+def write_lines(file: BinaryIO, lines: pa.Array) -> None:
+    """Write formatted lines to a binary file in one call"""
+    if len(lines) == 0:
+        return
     
-    with open(output_file, 'w', newline='') as file:
-        writer = csv.DictWriter(file, fieldnames=fieldnames)
-        writer.writeheader()
+    # The lines sit back to back in the array's data buffer, so write it as is
+    offsets = np.frombuffer(lines.buffers()[1], dtype=np.int32)
+    start = offsets[lines.offset]
+    end = offsets[lines.offset + len(lines)]
+    file.write(lines.buffers()[2][start:end])
+
+
+def write_output(batches: Iterator[pa.RecordBatch], output_file: str) -> None:
+    """Write batches of processed products to output CSV file as they arrive"""
+    with open(output_file, 'wb', buffering=IO_BUFFER_SIZE) as file:
+        file.write(OUTPUT_HEADER)
         
-        for product in products:
-            # Format prices with $ sign for output
-            row = {
-                'sku': product['sku'],
-                'old_price': f"${product['old_price']:.2f}",
-                'new_price': f"${product['new_price']:.2f}"
-            }
-            writer.writerow(row)
+        for batch in batches:
+            write_lines(file, format_csv_lines(batch))
 
 
 def main():
@@ -199,8 +614,11 @@ def main():
     engine.add_rule(OverstockedInventoryRule(priority=3))
     engine.add_rule(MinimumProfitRule(priority=4))
     
+    # Load sales data into memory (it's typically smaller than product data)
+    sales_data = load_sales_data(sales_file)
+    
     # Process the products and write output
-    processed_products = process_products(products_file, sales_file, engine)
+    processed_products = process_products(products_file, sales_data, engine)
     write_output(processed_products, output_file)
     
     print(f"Processing complete. Results written to {output_file}")